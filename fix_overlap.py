@@ -1,81 +1,119 @@
 from database import get_db_connection
-from sqlalchemy import text
+
+# Advisory lock key so concurrent starts do not run the same DDL twice
+OVERLAP_LOCK_KEY = 4711
+
+# Overlap DDL, one statement per entry so it can be sent in pipeline mode
+OVERLAP_DDL = [
+    # Re-create check_tool_availability with STRICT inequalities and an EXISTS probe
+    """
+    CREATE OR REPLACE FUNCTION check_tool_availability(
+        p_tool_id INTEGER,
+        p_start_date TIMESTAMP,
+        p_end_date TIMESTAMP
+    )
+    RETURNS BOOLEAN
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        v_has_conflict BOOLEAN;
+    BEGIN
+        SELECT EXISTS (
+            SELECT 1
+            FROM reservations
+            WHERE tool_id = p_tool_id
+              AND status IN ('pending', 'approved')
+              AND start_date < p_end_date
+              AND end_date > p_start_date
+        )
+        INTO v_has_conflict;
+
+        RETURN NOT v_has_conflict;
+    END;
+    $$
+    """,
+
+    # Overlap is enforced by the no_overlap constraint below; the trigger
+    # only keeps the "own tool" check
+    "DROP TRIGGER IF EXISTS trg_prevent_double_booking ON reservations",
+    "DROP FUNCTION IF EXISTS fn_prevent_double_booking()",
+    """
+    CREATE OR REPLACE FUNCTION fn_prevent_self_booking()
+    RETURNS TRIGGER
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        v_tool_owner_id INTEGER;
+    BEGIN
+        -- Kullanıcının kendi aletini rezerve etmeye çalışıp çalışmadığını kontrol et
+        SELECT owner_id INTO v_tool_owner_id
+        FROM tools
+        WHERE tool_id = NEW.tool_id;
+
+        IF v_tool_owner_id = NEW.borrower_id THEN
+            RAISE EXCEPTION 'You cannot reserve your own tool.';
+        END IF;
+
+        RETURN NEW;
+    END;
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_prevent_self_booking ON reservations",
+    """
+    CREATE TRIGGER trg_prevent_self_booking
+        BEFORE INSERT OR UPDATE OF tool_id, borrower_id ON reservations
+        FOR EACH ROW
+        EXECUTE FUNCTION fn_prevent_self_booking()
+    """,
+
+    # DIŞLAMA KISITLAMASI: Aynı alet için aktif rezervasyonlar çakışamaz
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE reservations DROP CONSTRAINT IF EXISTS no_overlap",
+    """
+    ALTER TABLE reservations ADD CONSTRAINT no_overlap
+        EXCLUDE USING gist (
+            tool_id WITH =,
+            tsrange(start_date, end_date, '[)') WITH &&
+        )
+        WHERE (status IN ('pending', 'approved'))
+    """,
+
+    # İNDEKS: Yalnızca aktif rezervasyonlar üzerinde çakışma kontrolü için
+    """
+    CREATE INDEX IF NOT EXISTS idx_reservation_active_overlap
+        ON reservations (tool_id, start_date, end_date)
+        WHERE status IN ('pending', 'approved')
+    """,
+]
 
 def fix_overlap_logic():
     print("Fixing overlap logic...")
     with get_db_connection() as conn:
+        raw = conn.connection.dbapi_connection
+        got_lock = raw.execute(
+            "SELECT pg_try_advisory_lock(%s)", (OVERLAP_LOCK_KEY,)
+        ).fetchone()[0]
+        if not got_lock:
+            print("Overlap logic is being updated by another process, skipping.")
+            return
         try:
-            # Re-create check_tool_availability with STRICT inequalities
+            # Send every statement in psycopg pipeline mode: commands are written
+            # without waiting for each reply and the pipeline syncs once on exit
             print("Updating check_tool_availability...")
-            conn.execute(text("""
-                CREATE OR REPLACE FUNCTION check_tool_availability(
-                    p_tool_id INTEGER,
-                    p_start_date TIMESTAMP,
-                    p_end_date TIMESTAMP
-                )
-                RETURNS BOOLEAN
-                LANGUAGE plpgsql
-                AS $$
-                DECLARE
-                    v_conflict_count INTEGER;
-                BEGIN
-                    SELECT COUNT(*)
-                    INTO v_conflict_count
-                    FROM reservations
-                    WHERE tool_id = p_tool_id
-                      AND status IN ('pending', 'approved')
-                      AND (
-                          (start_date < p_end_date AND end_date > p_start_date)
-                      );
-                    
-                    RETURN v_conflict_count = 0;
-                END;
-                $$;
-            """))
-
-            # Re-create fn_prevent_double_booking with STRICT inequalities
-            print("Updating fn_prevent_double_booking...")
-            conn.execute(text("""
-                CREATE OR REPLACE FUNCTION fn_prevent_double_booking()
-                RETURNS TRIGGER
-                LANGUAGE plpgsql
-                AS $$
-                DECLARE
-                    v_conflict_count INTEGER;
-                    v_tool_owner_id INTEGER;
-                BEGIN
-                    -- Kullanıcının kendi aletini rezerve etmeye çalışıp çalışmadığını kontrol et
-                    SELECT owner_id INTO v_tool_owner_id
-                    FROM tools
-                    WHERE tool_id = NEW.tool_id;
-                    
-                    IF v_tool_owner_id = NEW.borrower_id THEN
-                        RAISE EXCEPTION 'You cannot reserve your own tool.';
-                    END IF;
-                    
-                    -- Çakışan rezervasyonları kontrol et
-                    SELECT COUNT(*)
-                    INTO v_conflict_count
-                    FROM reservations
-                    WHERE tool_id = NEW.tool_id
-                      AND reservation_id != COALESCE(NEW.reservation_id, 0)
-                      AND status IN ('pending', 'approved')
-                      AND (start_date < NEW.end_date AND end_date > NEW.start_date);
-                    
-                    IF v_conflict_count > 0 THEN
-                        RAISE EXCEPTION 'This tool is already reserved for the selected dates.';
-                    END IF;
-                    
-                    RETURN NEW;
-                END;
-                $$;
-            """))
+            print("Replacing fn_prevent_double_booking with no_overlap constraint...")
+            print("Creating idx_reservation_active_overlap...")
+            with raw.pipeline():
+                for statement in OVERLAP_DDL:
+                    raw.execute(statement)
 
-            conn.commit()
+            raw.commit()
             print("Logic updated successfully!")
         except Exception as e:
-            conn.rollback()
+            raw.rollback()
             print(f"Logic update failed: {e}")
+        finally:
+            raw.execute("SELECT pg_advisory_unlock(%s)", (OVERLAP_LOCK_KEY,))
+            raw.commit()
 
 if __name__ == "__main__":
     fix_overlap_logic()
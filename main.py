@@ -1,15 +1,26 @@
-from fastapi import FastAPI, Request, Form, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Form, Depends, HTTPException, Query, Body
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncConnection
 from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.exc import SQLAlchemyError
+from pydantic import BaseModel
 from typing import Optional
-from datetime import date
+from datetime import datetime
+from decimal import Decimal
+import asyncio
+import hmac
 import os
 
-from database import get_db, execute_raw_sql, execute_function
+import bcrypt
+import msgpack
+import psycopg
+from jinja2 import FileSystemBytecodeCache
+
+from database import get_db, fetch_all, execute_write, bulk_insert
+from session_store import SessionUser, redis_client, create_session, get_session, delete_session
 
 # FastAPI uygulamasını başlat
 app = FastAPI(
@@ -18,14 +29,248 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# 1 KB üzerindeki yanıtlar (panel HTML'i) gzip ile sıkıştırılır
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=4)
+
+
+# Geliştirme modu: DEBUG=1 iken şablonlar her istekte diskten yeniden yüklenir
+DEBUG = os.getenv("DEBUG") == "1"
+
 # Şablon yapılandırması
 templates = Jinja2Templates(directory="templates")
+templates.env.auto_reload = DEBUG
+if not DEBUG:
+    # Derlenmiş şablon bayt kodu diskte saklanır; yeniden başlatmalarda ve her
+    # worker açılışında şablon kaynağı yeniden ayrıştırılmaz
+    # JINJA_CACHE_DIR verilmezse Jinja kullanıcıya özel, 0700 izinli dizini seçer
+    templates.env.bytecode_cache = FileSystemBytecodeCache(os.getenv("JINJA_CACHE_DIR"))
+
+# Derlenmiş şablonlar başlangıçta bir kez yüklenir; istek başına
+# loader araması ve mtime kontrolü yapılmaz
+COMPILED_TEMPLATES = {
+    name: templates.env.get_template(name)
+    for name in ("index.html", "dashboard.html", "partials/my_tools.html")
+}
+
+# Paneldeki tüm kullanıcılar için aynı olan listeler Redis'te kısa süre
+# önbelleğe alınır ve ilgili yazma işlemlerinden sonra geçersiz kılınır
+DASHBOARD_CACHE_TTL = 60
+AVAILABLE_TOOLS_KEY = "cache:available_tools"
+TOP_RATED_USERS_KEY = "cache:top_rated_users"
+NEVER_RESERVED_TOOLS_KEY = "cache:never_reserved_tools"
+
+# bcrypt'in kabul ettiği en uzun şifre (bayt)
+MAX_PASSWORD_BYTES = 72
+
+# Yönetici panelinde sayfa başına listelenen kullanıcı/alet sayısı
+ADMIN_PAGE_SIZE = 50
+
+# Alet aramasında döndürülen en fazla sonuç
+SEARCH_RESULT_LIMIT = 50
+
+# Panelde gösterilen rezervasyon/puan/aktivite geçmişi başına en fazla kayıt
+DASHBOARD_LIST_LIMIT = 50
+
+# SQL SORGULARI
+# Tüm sorgular modül düzeyinde bir kez oluşturulur; SQLAlchemy derleme
+# önbelleği ve asyncpg hazırlanmış ifade önbelleği her istekte aynı nesneye denk gelir
+_Q_LOGIN_USER = text("SELECT user_id, username, role, trust_score, password_hash FROM users WHERE username = :username")
+
+_Q_UPGRADE_PASSWORD_HASH = text("UPDATE users SET password_hash = :password_hash WHERE user_id = :user_id")
+
+_Q_REGISTER_USER = text("""
+    INSERT INTO users (username, email, password_hash, role)
+    VALUES (:username, :email, :password_hash, 'user')
+""")
+
+_Q_DASHBOARD = text(
+    "SELECT get_dashboard(:user_id, :is_admin, :admin_offset, :admin_limit, :list_limit) AS dashboard"
+).columns(dashboard=JSONB)
+
+_Q_AVAILABLE_TOOLS = text("SELECT * FROM v_available_tools ORDER BY tool_id")
+
+_Q_TOP_RATED_USERS = text("""
+    SELECT user_id, username, trust_score AS avg_rating, rating_count
+    FROM users
+    WHERE trust_score > 4.0 AND rating_count > 0
+    ORDER BY trust_score DESC
+""")
+
+_Q_NEVER_RESERVED_TOOLS = text("""
+    SELECT t.tool_id, t.name, t.category
+    FROM tools t
+    WHERE NOT EXISTS (
+        SELECT 1 FROM reservations r WHERE r.tool_id = t.tool_id
+    )
+    ORDER BY t.tool_id
+""")
+
+_Q_INSERT_TOOL = text("""
+    INSERT INTO tools (owner_id, name, description, category)
+    VALUES (:owner_id, :name, :description, :category)
+    RETURNING tool_id
+""")
+
+_Q_MY_TOOLS = text("""
+    SELECT tool_id, name, category, status
+    FROM tools
+    WHERE owner_id = :owner_id
+    ORDER BY tool_id
+""")
+
+_Q_TOOL_OWNER = text("SELECT owner_id FROM tools WHERE tool_id = :tool_id")
+
+_Q_DELETE_TOOL = text("DELETE FROM tools WHERE tool_id = :tool_id")
+
+# Yetki kontrolü SQL'e bağ parametresi olarak verilmez; yönetici ve sahip
+# için ayrı sorgular seçilir, böylece her ikisi de indeksle çalışır
+_Q_UPDATE_TOOL_ADMIN = text("""
+    UPDATE tools 
+    SET name = :name, description = :description, 
+        category = :category, status = :status
+    WHERE tool_id = :tool_id
+""")
+
+_Q_UPDATE_TOOL_OWNER = text("""
+    UPDATE tools 
+    SET name = :name, description = :description, 
+        category = :category, status = :status
+    WHERE tool_id = :tool_id AND owner_id = :owner_id
+""")
+
+_Q_SEARCH_TOOLS = text("""
+    SELECT t.*, u.username as owner_name
+    FROM tools t
+    JOIN users u ON t.owner_id = u.user_id
+    WHERE t.name ILIKE :query OR t.category ILIKE :query
+    ORDER BY similarity(t.name, :raw_query) DESC, t.name
+    LIMIT :limit
+""")
+
+_Q_INSERT_RESERVATION = text("""
+    INSERT INTO reservations (tool_id, borrower_id, start_date, end_date, status)
+    VALUES (:tool_id, :borrower_id, :start_date, :end_date, 'pending')
+    RETURNING reservation_id
+""")
+
+_Q_UPDATE_RESERVATION_STATUS_ADMIN = text("""
+    UPDATE reservations
+    SET status = :status, last_updated = CURRENT_TIMESTAMP
+    WHERE reservation_id = :reservation_id
+""")
+
+_Q_UPDATE_RESERVATION_STATUS_OWNER = text("""
+    UPDATE reservations r
+    SET status = :status, last_updated = CURRENT_TIMESTAMP
+    WHERE r.reservation_id = :reservation_id
+      AND EXISTS (
+          SELECT 1 FROM tools t 
+          WHERE t.tool_id = r.tool_id 
+            AND t.owner_id = :user_id
+      )
+""")
+
+_Q_DELETE_RESERVATION_ADMIN = text("""
+    DELETE FROM reservations 
+    WHERE reservation_id = :reservation_id
+""")
+
+_Q_DELETE_RESERVATION_BORROWER = text("""
+    DELETE FROM reservations 
+    WHERE reservation_id = :reservation_id 
+      AND borrower_id = :user_id
+""")
+
+_Q_INSERT_RATING = text("""
+    INSERT INTO ratings (reservation_id, rater_id, rated_user_id, score, comment)
+    VALUES (:reservation_id, :rater_id, :rated_user_id, :score, :comment)
+    RETURNING rating_id
+""")
+
+_Q_DELETE_USER = text("DELETE FROM users WHERE user_id = :user_id")
 
-# Basit oturum saklama
-user_sessions = {}
 
 # YARDIMCI FONKSİYONLAR
-def get_current_user(request: Request) -> Optional[dict]:
+def render(name: str, context: dict) -> HTMLResponse:
+    """
+    Derlenmiş şablonu verilen bağlamla işler ve HTML yanıtı döndürür.
+    
+    Bağlama yalnızca düz veri (dict, JSONB listeleri, Row) konur; şablonlar
+    veritabanına erişmez, gösterilen her alan sorguda seçilmiş olmalıdır.
+    """
+    template = templates.env.get_template(name) if DEBUG else COMPILED_TEMPLATES[name]
+    return HTMLResponse(template.render(context))
+
+
+def password_too_long(password: str) -> bool:
+    """bcrypt yalnızca ilk 72 baytı kabul eder; Türkçe harfler UTF-8'de 2 bayttır."""
+    return len(password.encode()) > MAX_PASSWORD_BYTES
+
+
+def hash_password(password: str) -> str:
+    """Şifreyi bcrypt ile özetler (hash)."""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(12)).decode()
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """Şifreyi kayıtlı özetle (hash) karşılaştırır."""
+    if password_hash.startswith("$2"):
+        if password_too_long(password):
+            return False
+        try:
+            return bcrypt.checkpw(password.encode(), password_hash.encode())
+        except ValueError:
+            # "$2" ile başlayan ama geçerli bcrypt özeti olmayan eski düz metin kayıt
+            pass
+    # Eski kayıtlar şifreyi düz metin olarak saklar
+    return hmac.compare_digest(password.encode(), password_hash.encode())
+
+
+async def get_cached_rows(key: str, statement) -> list:
+    """Sorgu sonucunu Redis önbelleğinden, yoksa veritabanından getirir."""
+    cached = await redis_client.get(key)
+    if cached is not None:
+        return msgpack.unpackb(cached)
+    
+    rows = [
+        # Decimal msgpack ile serileştirilemez
+        {k: float(v) if isinstance(v, Decimal) else v for k, v in row._asdict().items()}
+        for row in await fetch_all(statement)
+    ]
+    await redis_client.set(key, msgpack.packb(rows), ex=DASHBOARD_CACHE_TTL)
+    return rows
+
+
+async def tools_response(
+    request: Request,
+    db: AsyncConnection,
+    user: SessionUser,
+    message: str = "",
+    error: str = ""
+):
+    """
+    Alet ekleme/silme sonrası yanıtı oluşturur.
+    
+    HTMX isteklerinde (HX-Request) panel yeniden yüklenmez; yalnızca kullanıcının
+    aletleri sorgulanıp Aletlerim bölümü döndürülür. Düz form gönderimleri
+    panele yönlendirilir.
+    """
+    if request.headers.get("HX-Request") == "true":
+        my_tools = (await db.execute(_Q_MY_TOOLS, {"owner_id": user.user_id})).all()
+        response = render(
+            "partials/my_tools.html",
+            {"my_tools": my_tools, "tools_message": message, "tools_error": error}
+        )
+        if not error:
+            # Form yalnızca başarılı işlemden sonra temizlenir; hatada girdi korunur
+            response.headers["HX-Trigger"] = "tools-changed"
+        return response
+    if error:
+        return RedirectResponse(url=f"/dashboard?error={error}", status_code=303)
+    return RedirectResponse(url=f"/dashboard?message={message}", status_code=303)
+
+
+async def get_current_user(request: Request) -> Optional[SessionUser]:
     """
     Oturum bilgisinden mevcut giriş yapmış kullanıcıyı getirir.
     
@@ -33,15 +278,15 @@ def get_current_user(request: Request) -> Optional[dict]:
         request: FastAPI istek nesnesi.
         
     Returns:
-        dict: Giriş yapılmışsa kullanıcı verisi, aksi halde None.
+        SessionUser: Giriş yapılmışsa kullanıcı, aksi halde None.
     """
     session_id = request.cookies.get("session_id")
-    if session_id and session_id in user_sessions:
-        return user_sessions[session_id]
-    return None
+    if not session_id:
+        return None
+    return await get_session(session_id)
 
 
-def require_login(request: Request) -> dict:
+async def require_login(request: Request) -> SessionUser:
     """
     Kullanıcının giriş yapmış olmasını gerektirir.
     
@@ -49,12 +294,12 @@ def require_login(request: Request) -> dict:
         request: FastAPI istek nesnesi.
         
     Returns:
-        dict: Kullanıcı verisi.
+        SessionUser: Giriş yapmış kullanıcı.
         
     Raises:
         HTTPException: Kullanıcı giriş yapmamışsa.
     """
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(status_code=401, detail="Lütfen önce giriş yapın")
     return user
@@ -64,10 +309,10 @@ def require_login(request: Request) -> dict:
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Giriş/Kayıt sayfasını render eder (gösterir)."""
-    user = get_current_user(request)
+    user = await get_current_user(request)
     message = request.query_params.get("message", "")
     error = request.query_params.get("error", "")
-    return templates.TemplateResponse(
+    return render(
         "index.html",
         {"request": request, "user": user, "message": message, "error": error}
     )
@@ -77,37 +322,50 @@ async def index(request: Request):
 async def login(
     request: Request,
     username: str = Form(...),
-    password: str = Form(...),
-    db: Session = Depends(get_db)
+    password: str = Form(...)
 ):
     """
     Kullanıcı girişini işler.
     
+    Veritabanı bağlantısı bcrypt doğrulaması boyunca tutulmaz; kullanıcı satırı
+    ve gerekirse özet yükseltmesi ayrı, kısa bağlantılarla yapılır.
+    
     Args:
         username: Kullanıcı adı.
         password: Şifre.
-        db: Veritabanı oturumu.
         
     Returns:
         RedirectResponse: Başarılı ise panele yönlendirme.
     """
     try:
-        result = db.execute(
-            text("SELECT user_id, username, role, trust_score FROM users WHERE username = :username"),
-            {"username": username}
-        ).fetchone()
+        rows = await fetch_all(_Q_LOGIN_USER, {"username": username})
+        result = rows[0] if rows else None
         
-        if result:
-            import uuid
-            session_id = str(uuid.uuid4())
-            user_sessions[session_id] = {
-                "user_id": result[0],
-                "username": result[1],
-                "role": result[2],
-                "trust_score": float(result[3]) if result[3] else 0.0
-            }
+        # bcrypt CPU yoğundur; olay döngüsünü bloklamamak için ayrı iş parçacığında çalışır
+        loop = asyncio.get_running_loop()
+        if result and await loop.run_in_executor(None, verify_password, password, result[4]):
+            if not result[4].startswith("$2") and not password_too_long(password):
+                # Düz metin şifreyi ilk başarılı girişte bcrypt özetine yükselt
+                new_hash = await loop.run_in_executor(None, hash_password, password)
+                await execute_write(
+                    _Q_UPGRADE_PASSWORD_HASH,
+                    {"password_hash": new_hash, "user_id": result[0]}
+                )
+            session_id = await create_session(SessionUser(
+                user_id=result[0],
+                username=result[1],
+                role=result[2],
+                trust_score=float(result[3]) if result[3] else 0.0
+            ))
             response = RedirectResponse(url="/dashboard", status_code=303)
-            response.set_cookie("session_id", session_id)
+            # Çerez JavaScript'ten okunamaz; HTTPS üzerinden gelindiyse yalnızca HTTPS ile gönderilir
+            response.set_cookie(
+                "session_id",
+                session_id,
+                httponly=True,
+                samesite="lax",
+                secure=request.url.scheme == "https"
+            )
             return response
         else:
             return RedirectResponse(url="/?error=Geçersiz kullanıcı adı veya şifre", status_code=303)
@@ -120,33 +378,35 @@ async def register(
     request: Request,
     username: str = Form(...),
     email: str = Form(...),
-    password: str = Form(...),
-    db: Session = Depends(get_db)
+    password: str = Form(...)
 ):
     """
     Kullanıcı kaydını işler.
     
+    Şifre, veritabanı bağlantısı alınmadan önce özetlenir.
+    
     Args:
         username: İstenen kullanıcı adı.
         email: Kullanıcı e-postası.
         password: Şifre.
-        db: Veritabanı oturumu.
         
     Returns:
         RedirectResponse: Başarılı ise giriş sayfasına yönlendirme.
     """
+    if password_too_long(password):
+        return RedirectResponse(
+            url=f"/?error=Şifre en fazla {MAX_PASSWORD_BYTES} bayt olabilir",
+            status_code=303
+        )
+    
     try:
-        db.execute(
-            text("""
-                INSERT INTO users (username, email, password_hash, role)
-                VALUES (:username, :email, :password, 'user')
-            """),
-            {"username": username, "email": email, "password": password}
+        password_hash = await asyncio.get_running_loop().run_in_executor(None, hash_password, password)
+        await execute_write(
+            _Q_REGISTER_USER,
+            {"username": username, "email": email, "password_hash": password_hash}
         )
-        db.commit()
         return RedirectResponse(url="/?message=Kayıt başarılı! Lütfen giriş yapın.", status_code=303)
     except SQLAlchemyError as e:
-        db.rollback()
         error_msg = str(e)
         if "unique" in error_msg.lower():
             return RedirectResponse(url="/?error=Kullanıcı adı veya e-posta zaten mevcut", status_code=303)
@@ -157,8 +417,8 @@ async def register(
 async def logout(request: Request):
     """Kullanıcı çıkışını işler."""
     session_id = request.cookies.get("session_id")
-    if session_id and session_id in user_sessions:
-        del user_sessions[session_id]
+    if session_id:
+        await delete_session(session_id)
     response = RedirectResponse(url="/", status_code=303)
     response.delete_cookie("session_id")
     return response
@@ -166,13 +426,22 @@ async def logout(request: Request):
 
 # KULLANICI PANELİ ROTALARI
 @app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(request: Request, db: Session = Depends(get_db)):
+async def dashboard(
+    request: Request,
+    page: int = Query(1, ge=1)
+):
     """
     Tüm özellikleriyle kullanıcı panelini gösterir.
     
     Aletler, rezervasyonlar, puanlar ve varsa yönetici özelliklerini içerir.
+    Kullanıcıya özel listeler get_dashboard fonksiyonundan tek bir JSONB belgesi
+    olarak gelir; herkes için aynı olan listeler (müsait aletler, en iyi puanlı
+    kullanıcılar, hiç rezerve edilmemiş aletler) Redis önbelleğinden okunur.
+    Okumalar havuzdan ayrı bağlantılarla asyncio.gather ile eşzamanlı çalışır.
+    Yönetici listeleri ?page=N ile ADMIN_PAGE_SIZE satırlık sayfalar halinde yüklenir.
+    Rezervasyon, puan ve aktivite geçmişlerinin en yeni DASHBOARD_LIST_LIMIT kaydı gösterilir.
     """
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse(url="/?error=Lütfen önce giriş yapın", status_code=303)
     
@@ -180,149 +449,41 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
     error = request.query_params.get("error", "")
     
     try:
-        # Müsait aletleri görüntüle 
-        available_tools = db.execute(
-            text("SELECT * FROM v_available_tools")
-        ).fetchall()
-        
-        # Kullanıcının kendi aletlerini görüntüle
-        my_tools = db.execute(
-            text("SELECT * FROM tools WHERE owner_id = :user_id"),
-            {"user_id": user["user_id"]}
-        ).fetchall()
-        
-        # Kullanıcının kendi rezervasyonlarını görüntüle
-        my_reservations = db.execute(
-            text("""
-                SELECT r.*, t.name as tool_name, u.username as owner_name
-                FROM reservations r
-                JOIN tools t ON r.tool_id = t.tool_id
-                JOIN users u ON t.owner_id = u.user_id
-                WHERE r.borrower_id = :user_id
-                ORDER BY r.start_date DESC
-            """),
-            {"user_id": user["user_id"]}
-        ).fetchall()
-        
-        # Kullanıcının borcu olan aletlerini görüntüle
-        tool_reservations = db.execute(
-            text("""
-                SELECT r.*, t.name as tool_name, u.username as borrower_name
-                FROM reservations r
-                JOIN tools t ON r.tool_id = t.tool_id
-                JOIN users u ON r.borrower_id = u.user_id
-                WHERE t.owner_id = :user_id
-                ORDER BY r.start_date DESC
-            """),
-            {"user_id": user["user_id"]}
-        ).fetchall()
-        
-        # Kullanıcı tarafından verilen puanları görüntüle
-        my_ratings = db.execute(
-            text("""
-                SELECT r.*, u.username as rater_name
-                FROM ratings r
-                JOIN users u ON r.rater_id = u.user_id
-                WHERE r.rated_user_id = :user_id
-                ORDER BY r.created_at DESC
-            """),
-            {"user_id": user["user_id"]}
-        ).fetchall()
-        
-        # Kullanıcı aktivitesi raporunu görüntüle
-        activity_report = db.execute(
-            text("SELECT * FROM get_user_activity_report(:user_id)"),
-            {"user_id": user["user_id"]}
-        ).fetchall()
-        
-        # En iyi puan alan kullanıcıları görüntüle (puan > 4.0)
-        top_rated_users = db.execute(
-            text("""
-                SELECT u.user_id, u.username, AVG(r.score) as avg_rating, COUNT(r.rating_id) as rating_count
-                FROM users u
-                JOIN ratings r ON u.user_id = r.rated_user_id
-                GROUP BY u.user_id, u.username
-                HAVING AVG(r.score) > 4.0
-                ORDER BY avg_rating DESC
-            """)
-        ).fetchall()
-        
-        # Kullanıcı borcu olan aletleri görüntüle
-        never_reserved_tools = db.execute(
-            text("""
-                SELECT tool_id, name, category FROM tools
-                EXCEPT
-                SELECT DISTINCT t.tool_id, t.name, t.category 
-                FROM tools t
-                JOIN reservations r ON t.tool_id = r.tool_id
-            """)
-        ).fetchall()
-        
-        # Admin yetkili kullanıcılar için tüm kullanıcı ve aletleri görüntüle
-        all_users = []
-        all_tools = []
-        if user["role"] == "admin":
-            all_users = db.execute(
-                text("SELECT * FROM users ORDER BY user_id")
-            ).fetchall()
-            all_tools = db.execute(
-                text("""
-                    SELECT t.*, u.username as owner_name 
-                    FROM tools t 
-                    JOIN users u ON t.owner_id = u.user_id 
-                    ORDER BY t.tool_id
-                """)
-            ).fetchall()
-        
-        # Müsait aletler
-        all_available_tools = db.execute(
-            text("SELECT tool_id, name FROM tools WHERE status = 'available'")
-        ).fetchall()
-        
-        # Puan verilecek rezervasyonlar
-        ratable_reservations = db.execute(
-            text("""
-                SELECT r.reservation_id, t.name as tool_name, 
-                       CASE WHEN r.borrower_id = :user_id THEN t.owner_id ELSE r.borrower_id END as other_user_id,
-                       CASE WHEN r.borrower_id = :user_id THEN owner.username ELSE borrower.username END as other_user_name
-                FROM reservations r
-                JOIN tools t ON r.tool_id = t.tool_id
-                JOIN users owner ON t.owner_id = owner.user_id
-                JOIN users borrower ON r.borrower_id = borrower.user_id
-                WHERE r.status = 'completed'
-                  AND (r.borrower_id = :user_id OR t.owner_id = :user_id)
-                  AND NOT EXISTS (
-                      SELECT 1 FROM ratings rt 
-                      WHERE rt.reservation_id = r.reservation_id 
-                        AND rt.rater_id = :user_id
-                  )
-            """),
-            {"user_id": user["user_id"]}
-        ).fetchall()
+        # Kullanıcı paneli tek sorguda, tek anlık görüntüde; ortak listeler
+        # önbellekten (gerekirse veritabanından) aynı anda okunur
+        rows, available_tools, top_rated_users, never_reserved_tools = await asyncio.gather(
+            fetch_all(
+                _Q_DASHBOARD,
+                {
+                    "user_id": user.user_id,
+                    "is_admin": user.is_admin,
+                    "admin_offset": (page - 1) * ADMIN_PAGE_SIZE,
+                    "admin_limit": ADMIN_PAGE_SIZE,
+                    "list_limit": DASHBOARD_LIST_LIMIT
+                }
+            ),
+            get_cached_rows(AVAILABLE_TOOLS_KEY, _Q_AVAILABLE_TOOLS),
+            get_cached_rows(TOP_RATED_USERS_KEY, _Q_TOP_RATED_USERS),
+            get_cached_rows(NEVER_RESERVED_TOOLS_KEY, _Q_NEVER_RESERVED_TOOLS)
+        )
+        data = rows[0].dashboard
         
-        return templates.TemplateResponse(
+        return render(
             "dashboard.html",
             {
                 "request": request,
                 "user": user,
                 "message": message,
                 "error": error,
+                "admin_page": page,
                 "available_tools": available_tools,
-                "my_tools": my_tools,
-                "my_reservations": my_reservations,
-                "tool_reservations": tool_reservations,
-                "my_ratings": my_ratings,
-                "activity_report": activity_report,
                 "top_rated_users": top_rated_users,
                 "never_reserved_tools": never_reserved_tools,
-                "all_users": all_users,
-                "all_tools": all_tools,
-                "all_available_tools": all_available_tools,
-                "ratable_reservations": ratable_reservations
+                **data
             }
         )
     except SQLAlchemyError as e:
-        return templates.TemplateResponse(
+        return render(
             "dashboard.html",
             {
                 "request": request,
@@ -339,7 +500,6 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
                 "never_reserved_tools": [],
                 "all_users": [],
                 "all_tools": [],
-                "all_available_tools": [],
                 "ratable_reservations": []
             }
         )
@@ -352,71 +512,72 @@ async def add_tool(
     name: str = Form(...),
     description: str = Form(""),
     category: str = Form(""),
-    db: Session = Depends(get_db)
+    db: AsyncConnection = Depends(get_db)
 ):
     """
     Yeni bir alet ilanı ekler.
     
     ID üretimi için tool_seq SIRA (SEQUENCE) nesnesini kullanır.
     """
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse(url="/?error=Lütfen önce giriş yapın", status_code=303)
     
     try:
-        # Alet ekleme
-        db.execute(
-            text("""
-                INSERT INTO tools (owner_id, name, description, category)
-                VALUES (:owner_id, :name, :description, :category)
-            """),
+        # Alet ekleme; tool_seq'ten üretilen ID aynı gidiş-dönüşte RETURNING ile alınır
+        new_tool_id = (await db.execute(
+            _Q_INSERT_TOOL,
             {
-                "owner_id": user["user_id"],
+                "owner_id": user.user_id,
                 "name": name,
                 "description": description,
                 "category": category
             }
+        )).scalar_one()
+        await db.commit()
+        await redis_client.delete(AVAILABLE_TOOLS_KEY, NEVER_RESERVED_TOOLS_KEY)
+        return await tools_response(
+            request, db, user, message=f"Alet başarıyla eklendi! (ID: {new_tool_id})"
         )
-        db.commit()
-        return RedirectResponse(url="/dashboard?message=Alet başarıyla eklendi!", status_code=303)
     except SQLAlchemyError as e:
-        db.rollback()
-        return RedirectResponse(url=f"/dashboard?error=Alet eklenemedi: {str(e)}", status_code=303)
+        await db.rollback()
+        return await tools_response(request, db, user, error=f"Alet eklenemedi: {str(e)}")
 
 
 @app.post("/tools/delete/{tool_id}")
 async def delete_tool(
     request: Request,
     tool_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncConnection = Depends(get_db)
 ):
     """Bir alet ilanını siler."""
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse(url="/?error=Lütfen önce giriş yapın", status_code=303)
     
     try:
         # Sahiplik kontrolü
-        result = db.execute(
-            text("SELECT owner_id FROM tools WHERE tool_id = :tool_id"),
+        result = (await db.execute(
+            _Q_TOOL_OWNER,
             {"tool_id": tool_id}
-        ).fetchone()
+        )).fetchone()
         
         if not result:
-            return RedirectResponse(url="/dashboard?error=Alet bulunamadı", status_code=303)
+            return await tools_response(request, db, user, error="Alet bulunamadı")
         
-        if result[0] != user["user_id"] and user["role"] != "admin":
-            return RedirectResponse(url="/dashboard?error=Sadece kendi aletlerinizi silebilirsiniz", status_code=303)
+        if result[0] != user.user_id and not user.is_admin:
+            return await tools_response(request, db, user, error="Sadece kendi aletlerinizi silebilirsiniz")
         
-        db.execute(
-            text("DELETE FROM tools WHERE tool_id = :tool_id"),
+        await db.execute(
+            _Q_DELETE_TOOL,
             {"tool_id": tool_id}
         )
-        db.commit()
-        return RedirectResponse(url="/dashboard?message=Alet başarıyla silindi!", status_code=303)
+        await db.commit()
+        await redis_client.delete(AVAILABLE_TOOLS_KEY, TOP_RATED_USERS_KEY, NEVER_RESERVED_TOOLS_KEY)
+        return await tools_response(request, db, user, message="Alet başarıyla silindi!")
     except SQLAlchemyError as e:
-        db.rollback()
-        return RedirectResponse(url=f"/dashboard?error=Alet silinemedi: {str(e)}", status_code=303)
+        await db.rollback()
+        return await tools_response(request, db, user, error=f"Alet silinemedi: {str(e)}")
 
 
 @app.post("/tools/update/{tool_id}")
@@ -427,42 +588,37 @@ async def update_tool(
     description: str = Form(""),
     category: str = Form(""),
     status: str = Form("available"),
-    db: Session = Depends(get_db)
+    db: AsyncConnection = Depends(get_db)
 ):
     """
     Bir alet ilanını günceller.
     
     Bu işlem last_updated alanını güncellemek için trg_update_timestamp tetikleyicisini çalıştırır.
     """
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse(url="/?error=Lütfen önce giriş yapın", status_code=303)
     
     try:
-        db.execute(
-            text("""
-                UPDATE tools 
-                SET name = :name, description = :description, 
-                    category = :category, status = :status
-                WHERE tool_id = :tool_id AND (owner_id = :owner_id OR :is_admin = true)
-            """),
+        await db.execute(
+            _Q_UPDATE_TOOL_ADMIN if user.is_admin else _Q_UPDATE_TOOL_OWNER,
             {
                 "tool_id": tool_id,
                 "name": name,
                 "description": description,
                 "category": category,
                 "status": status,
-                "owner_id": user["user_id"],
-                "is_admin": user["role"] == "admin"
+                "owner_id": user.user_id
             }
         )
-        db.commit()
+        await db.commit()
+        await redis_client.delete(AVAILABLE_TOOLS_KEY, NEVER_RESERVED_TOOLS_KEY)
         return RedirectResponse(
             url="/dashboard?message=Alet güncellendi! (Tetikleyici zaman damgasını güncelledi)",
             status_code=303
         )
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         return RedirectResponse(url=f"/dashboard?error=Alet güncellenemedi: {str(e)}", status_code=303)
 
 
@@ -470,29 +626,24 @@ async def update_tool(
 async def search_tools(
     request: Request,
     q: str = "",
-    db: Session = Depends(get_db)
+    db: AsyncConnection = Depends(get_db)
 ):
     """
     İsme göre alet araması yapar.
     
-    Optimize edilmiş arama için idx_tool_name INDEX'ini kullanır.
+    Başında % olan ILIKE araması idx_tool_search_trgm trigram (GIN) INDEX'ini kullanır.
+    Sonuçlar isim benzerliğine göre sıralanır ve SEARCH_RESULT_LIMIT ile sınırlandırılır.
     """
-    user = get_current_user(request)
+    user = await get_current_user(request)
     
     try:
         # İndekslenmiş sütunu kullanarak arama yap
-        results = db.execute(
-            text("""
-                SELECT t.*, u.username as owner_name
-                FROM tools t
-                JOIN users u ON t.owner_id = u.user_id
-                WHERE t.name ILIKE :query OR t.category ILIKE :query
-                ORDER BY t.name
-            """),
-            {"query": f"%{q}%"}
-        ).fetchall()
+        results = (await db.execute(
+            _Q_SEARCH_TOOLS,
+            {"query": f"%{q}%", "raw_query": q, "limit": SEARCH_RESULT_LIMIT}
+        )).all()
         
-        return templates.TemplateResponse(
+        return render(
             "dashboard.html",
             {
                 "request": request,
@@ -511,7 +662,6 @@ async def search_tools(
                 "never_reserved_tools": [],
                 "all_users": [],
                 "all_tools": [],
-                "all_available_tools": [],
                 "ratable_reservations": []
             }
         )
@@ -524,45 +674,44 @@ async def search_tools(
 async def add_reservation(
     request: Request,
     tool_id: int = Form(...),
-    start_date: str = Form(...),
-    end_date: str = Form(...),
-    db: Session = Depends(get_db)
+    start_date: datetime = Form(...),
+    end_date: datetime = Form(...),
+    db: AsyncConnection = Depends(get_db)
 ):
     """
     Yeni bir rezervasyon oluşturur.
     
-    trg_prevent_double_booking tetikleyicisi çakışmaları kontrol eder
-    ve alet zaten rezerve edilmişse bir istisna (exception) fırlatır.
+    no_overlap DIŞLAMA KISITLAMASI (EXCLUDE CONSTRAINT) çakışmaları engeller,
+    trg_prevent_self_booking tetikleyicisi kullanıcının kendi aletini
+    rezerve etmesini engeller.
     """
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse(url="/?error=Lütfen önce giriş yapın", status_code=303)
     
     try:
-        db.execute(
-            text("""
-                INSERT INTO reservations (tool_id, borrower_id, start_date, end_date, status)
-                VALUES (:tool_id, :borrower_id, :start_date, :end_date, 'pending')
-            """),
+        new_reservation_id = (await db.execute(
+            _Q_INSERT_RESERVATION,
             {
                 "tool_id": tool_id,
-                "borrower_id": user["user_id"],
+                "borrower_id": user.user_id,
                 "start_date": start_date,
                 "end_date": end_date
             }
-        )
-        db.commit()
+        )).scalar_one()
+        await db.commit()
+        await redis_client.delete(NEVER_RESERVED_TOOLS_KEY)
         return RedirectResponse(
-            url="/dashboard?message=Rezervasyon başarıyla oluşturuldu!",
+            url=f"/dashboard?message=Rezervasyon başarıyla oluşturuldu! (ID: {new_reservation_id})",
             status_code=303
         )
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         error_msg = str(e)
-        # Tetikleyici hata mesajı kontrolü
-        if "already reserved" in error_msg.lower():
+        # Kısıtlama ve tetikleyici hata mesajı kontrolü
+        if "no_overlap" in error_msg.lower():
             return RedirectResponse(
-                url="/dashboard?error=TETİKLEYİCİ ÇALIŞTI: Bu alet seçilen tarihler için zaten rezerve edilmiş!",
+                url="/dashboard?error=EXCLUSION CONSTRAINT (DIŞLAMA KISITLAMASI): Bu alet seçilen tarihler için zaten rezerve edilmiş!",
                 status_code=303
             )
         elif "your own tool" in error_msg.lower():
@@ -578,39 +727,29 @@ async def update_reservation_status(
     request: Request,
     reservation_id: int,
     status: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncConnection = Depends(get_db)
 ):
     """Rezervasyon durumunu günceller (onayla, tamamla, iptal et)."""
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse(url="/?error=Lütfen önce giriş yapın", status_code=303)
     
     try:
-        db.execute(
-            text("""
-                UPDATE reservations r
-                SET status = :status, last_updated = CURRENT_TIMESTAMP
-                WHERE r.reservation_id = :reservation_id
-                  AND EXISTS (
-                      SELECT 1 FROM tools t 
-                      WHERE t.tool_id = r.tool_id 
-                        AND (t.owner_id = :user_id OR :is_admin = true)
-                  )
-            """),
+        await db.execute(
+            _Q_UPDATE_RESERVATION_STATUS_ADMIN if user.is_admin else _Q_UPDATE_RESERVATION_STATUS_OWNER,
             {
                 "reservation_id": reservation_id,
                 "status": status,
-                "user_id": user["user_id"],
-                "is_admin": user["role"] == "admin"
+                "user_id": user.user_id
             }
         )
-        db.commit()
+        await db.commit()
         return RedirectResponse(
             url=f"/dashboard?message=Rezervasyon durumu '{status}' olarak güncellendi!",
             status_code=303
         )
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         return RedirectResponse(url=f"/dashboard?error=Güncelleme başarısız: {str(e)}", status_code=303)
 
 
@@ -618,30 +757,26 @@ async def update_reservation_status(
 async def delete_reservation(
     request: Request,
     reservation_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncConnection = Depends(get_db)
 ):
     """Bir rezervasyonu iptal eder/siler."""
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse(url="/?error=Lütfen önce giriş yapın", status_code=303)
     
     try:
-        db.execute(
-            text("""
-                DELETE FROM reservations 
-                WHERE reservation_id = :reservation_id 
-                  AND (borrower_id = :user_id OR :is_admin = true)
-            """),
+        await db.execute(
+            _Q_DELETE_RESERVATION_ADMIN if user.is_admin else _Q_DELETE_RESERVATION_BORROWER,
             {
                 "reservation_id": reservation_id,
-                "user_id": user["user_id"],
-                "is_admin": user["role"] == "admin"
+                "user_id": user.user_id
             }
         )
-        db.commit()
+        await db.commit()
+        await redis_client.delete(AVAILABLE_TOOLS_KEY, TOP_RATED_USERS_KEY, NEVER_RESERVED_TOOLS_KEY)
         return RedirectResponse(url="/dashboard?message=Rezervasyon iptal edildi!", status_code=303)
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         return RedirectResponse(url=f"/dashboard?error=İptal başarısız: {str(e)}", status_code=303)
 
 
@@ -653,7 +788,7 @@ async def add_rating(
     rated_user_id: int = Form(...),
     score: int = Form(...),
     comment: str = Form(""),
-    db: Session = Depends(get_db)
+    db: AsyncConnection = Depends(get_db)
 ):
     """
     Tamamlanan bir işlem için puan gönderir.
@@ -661,31 +796,29 @@ async def add_rating(
     CHECK kısıtlaması (CONSTRAINT) puanın 1-5 arasında olmasını sağlar.
     trg_update_user_trust_score tetikleyicisi kullanıcının güven skorunu günceller.
     """
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse(url="/?error=Lütfen önce giriş yapın", status_code=303)
     
     try:
-        db.execute(
-            text("""
-                INSERT INTO ratings (reservation_id, rater_id, rated_user_id, score, comment)
-                VALUES (:reservation_id, :rater_id, :rated_user_id, :score, :comment)
-            """),
+        new_rating_id = (await db.execute(
+            _Q_INSERT_RATING,
             {
                 "reservation_id": reservation_id,
-                "rater_id": user["user_id"],
+                "rater_id": user.user_id,
                 "rated_user_id": rated_user_id,
                 "score": score,
                 "comment": comment
             }
-        )
-        db.commit()
+        )).scalar_one()
+        await db.commit()
+        await redis_client.delete(AVAILABLE_TOOLS_KEY, TOP_RATED_USERS_KEY)
         return RedirectResponse(
-            url="/dashboard?message=Puan gönderildi! (Tetikleyici  güven skorunu güncelledi)",
+            url=f"/dashboard?message=Puan gönderildi! (ID: {new_rating_id}, Tetikleyici  güven skorunu güncelledi)",
             status_code=303
         )
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         error_msg = str(e)
         if "chk_rating_score" in error_msg.lower():
             return RedirectResponse(
@@ -695,34 +828,120 @@ async def add_rating(
         return RedirectResponse(url=f"/dashboard?error=Puanlama başarısız: {error_msg}", status_code=303)
 
 
+# TOPLU EKLEME ROTALARI
+# Tohum verisi ve içe aktarma için JSON listesi alır; satırlar tek bir
+# COPY FROM STDIN akışında eklenir. HTML formları tek satırlık rotaları kullanır.
+# Tek istekte en fazla BULK_INSERT_MAX_ROWS satır kabul edilir.
+BULK_INSERT_MAX_ROWS = 1000
+
+
+class BulkTool(BaseModel):
+    name: str
+    description: str = ""
+    category: str = ""
+
+
+class BulkReservation(BaseModel):
+    tool_id: int
+    start_date: datetime
+    end_date: datetime
+
+
+async def run_bulk_insert(table: str, columns: list[str], rows: list[tuple]) -> JSONResponse:
+    """bulk_insert'i iş parçacığı havuzunda çalıştırır ve eklenen satır sayısını döndürür."""
+    try:
+        inserted = await asyncio.get_running_loop().run_in_executor(
+            None, bulk_insert, table, columns, rows
+        )
+    except psycopg.Error as e:
+        raise HTTPException(status_code=400, detail=f"Toplu ekleme başarısız: {e}")
+    except SQLAlchemyError as e:
+        # engine.raw_connection() bağlantı hatasını veya havuz zaman aşımını sarar
+        raise HTTPException(status_code=503, detail=f"Veritabanına bağlanılamadı: {e}")
+    return JSONResponse({"inserted": inserted})
+
+
+@app.post("/tools/bulk_add")
+async def bulk_add_tools(
+    tools: list[BulkTool] = Body(..., max_length=BULK_INSERT_MAX_ROWS),
+    user: SessionUser = Depends(require_login)
+):
+    """Giriş yapan kullanıcı adına birden çok aleti tek COPY ile ekler."""
+    response = await run_bulk_insert(
+        "tools",
+        ["owner_id", "name", "description", "category"],
+        [(user.user_id, t.name, t.description, t.category) for t in tools]
+    )
+    await redis_client.delete(AVAILABLE_TOOLS_KEY, NEVER_RESERVED_TOOLS_KEY)
+    return response
+
+
+@app.post("/reservations/bulk_add")
+async def bulk_add_reservations(
+    reservations: list[BulkReservation] = Body(..., max_length=BULK_INSERT_MAX_ROWS),
+    user: SessionUser = Depends(require_login)
+):
+    """
+    Giriş yapan kullanıcı adına birden çok rezervasyonu tek COPY ile ekler.
+    
+    COPY de kısıtlamaları ve tetikleyicileri çalıştırır; no_overlap veya
+    trg_prevent_self_booking ihlalinde hiçbir satır eklenmez.
+    """
+    response = await run_bulk_insert(
+        "reservations",
+        ["tool_id", "borrower_id", "start_date", "end_date", "status"],
+        [(r.tool_id, user.user_id, r.start_date, r.end_date, "pending") for r in reservations]
+    )
+    await redis_client.delete(NEVER_RESERVED_TOOLS_KEY)
+    return response
+
+
 # YÖNETİCİ (ADMIN) ROTALARI
 @app.post("/admin/users/delete/{user_id}")
 async def admin_delete_user(
     request: Request,
     user_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncConnection = Depends(get_db)
 ):
     """Yönetici: Bir kullanıcıyı siler."""
-    user = get_current_user(request)
-    if not user or user["role"] != "admin":
+    user = await get_current_user(request)
+    if not user or not user.is_admin:
         return RedirectResponse(url="/dashboard?error=Yönetici izni gerekli", status_code=303)
     
-    if user_id == user["user_id"]:
+    if user_id == user.user_id:
         return RedirectResponse(url="/dashboard?error=Kendinizi silemezsiniz", status_code=303)
     
     try:
-        db.execute(
-            text("DELETE FROM users WHERE user_id = :user_id"),
+        await db.execute(
+            _Q_DELETE_USER,
             {"user_id": user_id}
         )
-        db.commit()
+        await db.commit()
+        await redis_client.delete(AVAILABLE_TOOLS_KEY, TOP_RATED_USERS_KEY, NEVER_RESERVED_TOOLS_KEY)
         return RedirectResponse(url="/dashboard?message=Kullanıcı başarıyla silindi!", status_code=303)
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         return RedirectResponse(url=f"/dashboard?error=Silme işlemi başarısız: {str(e)}", status_code=303)
 
 
 # main 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    if DEBUG:
+        # Geliştirme: tek worker, kod değişince otomatik yeniden başlatma
+        uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
+    else:
+        # Üretim: birden çok worker; oturumlar ve önbellek Redis'te paylaşılır.
+        # Worker'lar WEB_CONCURRENCY'yi ortamdan devralır ve database.py her
+        # worker'ın havuzunu DB_MAX_CONNECTIONS bütçesini aşmayacak şekilde böler.
+        workers = int(os.getenv("WEB_CONCURRENCY", min(os.cpu_count() or 1, 4)))
+        os.environ["WEB_CONCURRENCY"] = str(workers)
+        uvicorn.run(
+            "main:app",
+            host="127.0.0.1",
+            port=8000,
+            workers=workers,
+            # uvloop/httptools kuruluysa seçilir; Windows'ta asyncio/h11'e düşülür
+            loop="auto",
+            http="auto"
+        )
@@ -1,5 +1,9 @@
 from database import get_db_connection
 from sqlalchemy import text
+import bcrypt
+
+# Old seed data stored the demo password after this prefix instead of a real hash
+LEGACY_SEED_HASH_PREFIX = "pbkdf2:sha256:260000$"
 
 def run_migration():
     print("Starting migration...")
@@ -14,6 +18,8 @@ def run_migration():
             print("Dropping old functions...")
             conn.execute(text("DROP FUNCTION IF EXISTS check_tool_availability(INTEGER, DATE, DATE)"))
             conn.execute(text("DROP FUNCTION IF EXISTS get_user_activity_report(INTEGER)"))
+            conn.execute(text("DROP FUNCTION IF EXISTS get_dashboard(INTEGER, BOOLEAN)"))
+            conn.execute(text("DROP FUNCTION IF EXISTS get_dashboard(INTEGER, BOOLEAN, INTEGER, INTEGER)"))
             
             # 3. Re-create check_tool_availability with TIMESTAMP
             print("Creating check_tool_availability...")
@@ -43,7 +49,7 @@ def run_migration():
                 $$;
             """))
 
-            # 4. Re-create get_user_activity_report with TIMESTAMP
+            # 4. Re-create get_user_activity_report with TIMESTAMP as a single RETURN QUERY
             print("Creating get_user_activity_report...")
             conn.execute(text("""
                 CREATE OR REPLACE FUNCTION get_user_activity_report(p_user_id INTEGER)
@@ -56,11 +62,11 @@ def run_migration():
                 )
                 LANGUAGE plpgsql
                 AS $$
-                DECLARE
-                    v_record RECORD;
-                    v_cursor CURSOR FOR
+                BEGIN
+                    -- Tek plan: satırlar imleç döngüsü olmadan doğrudan döndürülür
+                    RETURN QUERY
                         SELECT 
-                            'borrowed' AS type,
+                            'borrowed'::VARCHAR AS type,
                             t.name AS tool_name,
                             owner.username AS partner,
                             r.start_date AS activity_date,
@@ -71,7 +77,7 @@ def run_migration():
                         WHERE r.borrower_id = p_user_id
                         UNION ALL
                         SELECT 
-                            'lent' AS type,
+                            'lent'::VARCHAR AS type,
                             t.name AS tool_name,
                             borrower.username AS partner,
                             r.start_date AS activity_date,
@@ -80,25 +86,266 @@ def run_migration():
                         JOIN tools t ON r.tool_id = t.tool_id
                         JOIN users borrower ON r.borrower_id = borrower.user_id
                         WHERE t.owner_id = p_user_id
-                        ORDER BY activity_date DESC;
+                        ORDER BY 4 DESC;
+                END;
+                $$;
+            """))
+
+            # 5. Keep rating_count on users next to trust_score so top rated users
+            #    are read from users instead of aggregating ratings
+            print("Adding users.rating_count...")
+            conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS rating_count INTEGER NOT NULL DEFAULT 0"))
+            # Recount every user: counts left stale by earlier deletes are reset too
+            conn.execute(text("""
+                UPDATE users u
+                SET rating_count = (SELECT COUNT(*) FROM ratings r WHERE r.rated_user_id = u.user_id)
+            """))
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION fn_update_trust_score()
+                RETURNS TRIGGER
+                LANGUAGE plpgsql
+                AS $$
+                DECLARE
+                    v_user_id INTEGER;
                 BEGIN
-                    OPEN v_cursor;
-                    LOOP
-                        FETCH v_cursor INTO v_record;
-                        EXIT WHEN NOT FOUND;
-                        
-                        activity_type := v_record.type;
-                        tool_name := v_record.tool_name;
-                        partner_name := v_record.partner;
-                        activity_date := v_record.activity_date;
-                        status := v_record.status;
-                        
-                        RETURN NEXT;
-                    END LOOP;
-                    CLOSE v_cursor;
+                    -- Puan silindiğinde (ör. alet/kullanıcı silinince CASCADE) de yeniden hesaplanır
+                    IF TG_OP = 'DELETE' THEN
+                        v_user_id := OLD.rated_user_id;
+                    ELSE
+                        v_user_id := NEW.rated_user_id;
+                    END IF;
+
+                    UPDATE users
+                    SET trust_score = calculate_trust_score(v_user_id),
+                        rating_count = (SELECT COUNT(*) FROM ratings WHERE rated_user_id = v_user_id)
+                    WHERE user_id = v_user_id;
+                    
+                    RETURN NULL;
                 END;
                 $$;
             """))
+            # Fire on DELETE as well so cascaded rating deletes lower the count
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_update_user_trust_score ON ratings"))
+            conn.execute(text("""
+                CREATE TRIGGER trg_update_user_trust_score
+                    AFTER INSERT OR DELETE ON ratings
+                    FOR EACH ROW
+                    EXECUTE FUNCTION fn_update_trust_score()
+            """))
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_user_top_rated
+                    ON users(trust_score DESC) WHERE trust_score > 4.0
+            """))
+            conn.execute(text("DROP MATERIALIZED VIEW IF EXISTS mv_top_rated"))
+
+            # 6. Create get_dashboard: whole dashboard as one JSONB document
+            print("Creating get_dashboard...")
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION get_dashboard(
+                    p_user_id INTEGER,
+                    p_is_admin BOOLEAN,
+                    p_admin_offset INTEGER DEFAULT 0,
+                    p_admin_limit INTEGER DEFAULT 50,
+                    p_list_limit INTEGER DEFAULT 50
+                )
+                RETURNS JSONB
+                LANGUAGE sql
+                STABLE
+                AS $$
+                    -- Kullanıcının kiracı veya alet sahibi olduğu rezervasyonlar bir kez okunur;
+                    -- kendi rezervasyonları, aletlerine gelen rezervasyonlar, aktivite raporu ve
+                    -- puanlanabilir rezervasyonlar bu ortak CTE'den türetilir
+                    WITH user_reservations AS MATERIALIZED (
+                        SELECT 'borrowed' AS activity_type,
+                               r.reservation_id, r.borrower_id, t.owner_id,
+                               r.start_date, r.end_date, r.status,
+                               t.name AS tool_name,
+                               owner.username AS owner_name,
+                               borrower.username AS borrower_name
+                        FROM reservations r
+                        JOIN tools t ON r.tool_id = t.tool_id
+                        JOIN users owner ON t.owner_id = owner.user_id
+                        JOIN users borrower ON r.borrower_id = borrower.user_id
+                        WHERE r.borrower_id = p_user_id
+                        UNION ALL
+                        SELECT 'lent' AS activity_type,
+                               r.reservation_id, r.borrower_id, t.owner_id,
+                               r.start_date, r.end_date, r.status,
+                               t.name AS tool_name,
+                               owner.username AS owner_name,
+                               borrower.username AS borrower_name
+                        FROM reservations r
+                        JOIN tools t ON r.tool_id = t.tool_id
+                        JOIN users owner ON t.owner_id = owner.user_id
+                        JOIN users borrower ON r.borrower_id = borrower.user_id
+                        WHERE t.owner_id = p_user_id
+                    )
+                    SELECT jsonb_build_object(
+                        'my_tools', COALESCE((
+                            SELECT jsonb_agg(jsonb_build_object(
+                                'tool_id', t.tool_id,
+                                'name', t.name,
+                                'category', t.category,
+                                'status', t.status
+                            ) ORDER BY t.tool_id)
+                            FROM tools t
+                            WHERE t.owner_id = p_user_id
+                        ), '[]'::jsonb),
+                        -- Geçmiş listeleri en yeni p_list_limit kayıtla sınırlandırılır
+                        'my_reservations', COALESCE((
+                            SELECT jsonb_agg(jsonb_build_object(
+                                'reservation_id', ur.reservation_id,
+                                'tool_name', ur.tool_name,
+                                'owner_name', ur.owner_name,
+                                'start_date', ur.start_date::text,
+                                'end_date', ur.end_date::text,
+                                'status', ur.status
+                            ) ORDER BY ur.start_date DESC)
+                            FROM (
+                                SELECT * FROM user_reservations
+                                WHERE borrower_id = p_user_id
+                                ORDER BY start_date DESC
+                                LIMIT p_list_limit
+                            ) ur
+                        ), '[]'::jsonb),
+                        'tool_reservations', COALESCE((
+                            SELECT jsonb_agg(jsonb_build_object(
+                                'reservation_id', ur.reservation_id,
+                                'tool_name', ur.tool_name,
+                                'borrower_name', ur.borrower_name,
+                                'start_date', ur.start_date::text,
+                                'end_date', ur.end_date::text,
+                                'status', ur.status
+                            ) ORDER BY ur.start_date DESC)
+                            FROM (
+                                SELECT * FROM user_reservations
+                                WHERE owner_id = p_user_id
+                                ORDER BY start_date DESC
+                                LIMIT p_list_limit
+                            ) ur
+                        ), '[]'::jsonb),
+                        'my_ratings', COALESCE((
+                            SELECT jsonb_agg(jsonb_build_object(
+                                'rater_name', r.rater_name,
+                                'score', r.score,
+                                'comment', r.comment,
+                                'created_at', r.created_at::text
+                            ) ORDER BY r.created_at DESC)
+                            FROM (
+                                SELECT u.username AS rater_name, r.score, r.comment, r.created_at
+                                FROM ratings r
+                                JOIN users u ON r.rater_id = u.user_id
+                                WHERE r.rated_user_id = p_user_id
+                                ORDER BY r.created_at DESC
+                                LIMIT p_list_limit
+                            ) r
+                        ), '[]'::jsonb),
+                        'activity_report', COALESCE((
+                            SELECT jsonb_agg(jsonb_build_object(
+                                'activity_type', a.activity_type,
+                                'tool_name', a.tool_name,
+                                'partner_name', a.partner_name,
+                                'activity_date', a.activity_date::text,
+                                'status', a.status
+                            ) ORDER BY a.activity_date DESC)
+                            FROM (
+                                -- get_user_activity_report ile aynı satırlar; ayrıca fonksiyon
+                                -- çağrılıp rezervasyonlar yeniden taranmaz
+                                SELECT activity_type, tool_name,
+                                       CASE WHEN activity_type = 'borrowed' THEN owner_name ELSE borrower_name END AS partner_name,
+                                       start_date AS activity_date,
+                                       status
+                                FROM user_reservations
+                                ORDER BY start_date DESC
+                                LIMIT p_list_limit
+                            ) a
+                        ), '[]'::jsonb),
+                        'ratable_reservations', COALESCE((
+                            SELECT jsonb_agg(jsonb_build_object(
+                                'reservation_id', ur.reservation_id,
+                                'tool_name', ur.tool_name,
+                                'other_user_id', CASE WHEN ur.borrower_id = p_user_id THEN ur.owner_id ELSE ur.borrower_id END,
+                                'other_user_name', CASE WHEN ur.borrower_id = p_user_id THEN ur.owner_name ELSE ur.borrower_name END
+                            ))
+                            FROM user_reservations ur
+                            LEFT JOIN ratings rt
+                                   ON rt.reservation_id = ur.reservation_id
+                                  AND rt.rater_id = p_user_id
+                            WHERE ur.status = 'completed'
+                              AND rt.rating_id IS NULL
+                        ), '[]'::jsonb),
+                        -- Yönetici listeleri yalnızca p_is_admin ise, sayfa sayfa doldurulur
+                        'all_users', CASE WHEN p_is_admin THEN COALESCE((
+                            SELECT jsonb_agg(u ORDER BY u.user_id)
+                            FROM (
+                                SELECT user_id, username, role, trust_score
+                                FROM users
+                                ORDER BY user_id
+                                LIMIT p_admin_limit OFFSET p_admin_offset
+                            ) u
+                        ), '[]'::jsonb) ELSE '[]'::jsonb END,
+                        'all_tools', CASE WHEN p_is_admin THEN COALESCE((
+                            SELECT jsonb_agg(a ORDER BY a.tool_id)
+                            FROM (
+                                SELECT t.tool_id, t.name, u.username AS owner_name, t.status
+                                FROM tools t
+                                JOIN users u ON t.owner_id = u.user_id
+                                ORDER BY t.tool_id
+                                LIMIT p_admin_limit OFFSET p_admin_offset
+                            ) a
+                        ), '[]'::jsonb) ELSE '[]'::jsonb END,
+                        'admin_has_next', p_is_admin AND (
+                            EXISTS (SELECT 1 FROM users ORDER BY user_id OFFSET p_admin_offset + p_admin_limit)
+                            OR EXISTS (SELECT 1 FROM tools ORDER BY tool_id OFFSET p_admin_offset + p_admin_limit)
+                        )
+                    );
+                $$;
+            """))
+
+            # 7. Index reservations.tool_id for the never-reserved NOT EXISTS anti-join
+            print("Creating idx_res_tool_id...")
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_res_tool_id ON reservations(tool_id)"))
+
+            # 8. Composite indexes for the dashboard's filter + ORDER BY columns
+            print("Creating dashboard indexes...")
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_res_borrower_start
+                    ON reservations(borrower_id, start_date DESC) INCLUDE (tool_id, status)
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_tool_owner ON tools(owner_id)"))
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_rating_rated_created
+                    ON ratings(rated_user_id, created_at DESC)
+            """))
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_rating_reservation_rater
+                    ON ratings(reservation_id, rater_id)
+            """))
+
+            # 9. Trigram GIN index so ILIKE '%q%' search does not scan every tool
+            print("Creating idx_tool_search_trgm...")
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_tool_search_trgm
+                    ON tools USING gin (name gin_trgm_ops, category gin_trgm_ops)
+            """))
+
+            # 10. Rehash the demo accounts' legacy seed values with bcrypt so they
+            #     log in with their documented passwords (admin123 / user123)
+            print("Rehashing legacy seed passwords...")
+            legacy_users = conn.execute(
+                text("SELECT user_id, password_hash FROM users WHERE starts_with(password_hash, :prefix)"),
+                {"prefix": LEGACY_SEED_HASH_PREFIX}
+            ).fetchall()
+            for user_id, legacy_hash in legacy_users:
+                password = legacy_hash[len(LEGACY_SEED_HASH_PREFIX):]
+                conn.execute(
+                    text("UPDATE users SET password_hash = :password_hash WHERE user_id = :user_id"),
+                    {
+                        "password_hash": bcrypt.hashpw(password.encode(), bcrypt.gensalt(12)).decode(),
+                        "user_id": user_id
+                    }
+                )
 
             conn.commit()
             print("Migration completed successfully!")
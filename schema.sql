@@ -2,21 +2,31 @@
 
 -- Varsa mevcut nesneleri temizle
 DROP TRIGGER IF EXISTS trg_update_timestamp ON tools;
-DROP TRIGGER IF EXISTS trg_prevent_double_booking ON reservations;
+DROP TRIGGER IF EXISTS trg_prevent_self_booking ON reservations;
 DROP TRIGGER IF EXISTS trg_update_user_trust_score ON ratings;
 DROP FUNCTION IF EXISTS fn_update_timestamp();
 DROP FUNCTION IF EXISTS fn_prevent_double_booking();
+DROP FUNCTION IF EXISTS fn_prevent_self_booking();
 DROP FUNCTION IF EXISTS fn_update_trust_score();
 DROP FUNCTION IF EXISTS calculate_trust_score(INTEGER);
 DROP FUNCTION IF EXISTS get_user_activity_report(INTEGER);
 DROP FUNCTION IF EXISTS check_tool_availability(INTEGER, DATE, DATE);
+DROP FUNCTION IF EXISTS get_dashboard(INTEGER, BOOLEAN);
+DROP FUNCTION IF EXISTS get_dashboard(INTEGER, BOOLEAN, INTEGER, INTEGER);
+DROP FUNCTION IF EXISTS get_dashboard(INTEGER, BOOLEAN, INTEGER, INTEGER, INTEGER);
 DROP VIEW IF EXISTS v_available_tools;
+DROP MATERIALIZED VIEW IF EXISTS mv_top_rated;
 DROP TABLE IF EXISTS ratings;
 DROP TABLE IF EXISTS reservations;
 DROP TABLE IF EXISTS tools;
 DROP TABLE IF EXISTS users;
 DROP SEQUENCE IF EXISTS tool_seq;
 
+-- EKLENTİ: GiST indekslerinde eşitlik (=) operatörü için
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+-- EKLENTİ: ILIKE '%...%' aramalarında trigram (GIN) indeksi için
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 
 -- SIRA (SEQUENCE): Aletler için özel ID üretimi
 CREATE SEQUENCE tool_seq
@@ -36,6 +46,7 @@ CREATE TABLE users (
     password_hash VARCHAR(255) NOT NULL,
     role VARCHAR(10) NOT NULL DEFAULT 'user',
     trust_score DECIMAL(3,2) DEFAULT 0.00,
+    rating_count INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT chk_user_role CHECK (role IN ('admin', 'user')),
@@ -71,7 +82,12 @@ CREATE TABLE reservations (
     CONSTRAINT fk_reservation_tool FOREIGN KEY (tool_id) REFERENCES tools(tool_id) ON DELETE CASCADE,
     CONSTRAINT fk_reservation_borrower FOREIGN KEY (borrower_id) REFERENCES users(user_id) ON DELETE CASCADE,
     CONSTRAINT chk_reservation_dates CHECK (end_date >= start_date),
-    CONSTRAINT chk_reservation_status CHECK (status IN ('pending', 'approved', 'completed', 'cancelled'))
+    CONSTRAINT chk_reservation_status CHECK (status IN ('pending', 'approved', 'completed', 'cancelled')),
+    -- DIŞLAMA KISITLAMASI: Aynı alet için aktif rezervasyonlar çakışamaz
+    CONSTRAINT no_overlap EXCLUDE USING gist (
+        tool_id WITH =,
+        tsrange(start_date, end_date, '[)') WITH &&
+    ) WHERE (status IN ('pending', 'approved'))
 );
 
 
@@ -95,7 +111,22 @@ CREATE TABLE ratings (
 -- İNDEKS: Arama optimizasyonu için alet adı üzerinde
 CREATE INDEX idx_tool_name ON tools(name);
 CREATE INDEX idx_tool_category ON tools(category);
+-- İNDEKS: Başında % olan ILIKE aramaları için trigram GIN indeksi
+CREATE INDEX idx_tool_search_trgm ON tools USING gin (name gin_trgm_ops, category gin_trgm_ops);
 CREATE INDEX idx_reservation_dates ON reservations(start_date, end_date);
+-- İNDEKS: Yalnızca aktif rezervasyonlar üzerinde çakışma kontrolü için (kısmi indeks)
+CREATE INDEX idx_reservation_active_overlap ON reservations(tool_id, start_date, end_date)
+    WHERE status IN ('pending', 'approved');
+-- İNDEKS: Rezervasyonu olmayan aletleri bulan NOT EXISTS anti-join'i için
+CREATE INDEX idx_res_tool_id ON reservations(tool_id);
+-- İNDEKS: Panel sorgularının filtre + sıralama sütunları (sıralama adımı gerekmez)
+CREATE INDEX idx_res_borrower_start ON reservations(borrower_id, start_date DESC) INCLUDE (tool_id, status);
+CREATE INDEX idx_tool_owner ON tools(owner_id);
+-- İNDEKS: En iyi puanlı kullanıcılar için kısmi indeks
+CREATE INDEX idx_user_top_rated ON users(trust_score DESC) WHERE trust_score > 4.0;
+CREATE INDEX idx_rating_rated_created ON ratings(rated_user_id, created_at DESC);
+-- İNDEKS: Puanlanabilir rezervasyonlar için ratings anti-join'i
+CREATE INDEX idx_rating_reservation_rater ON ratings(reservation_id, rater_id);
 
 
 -- GÖRÜNÜM (VIEW): Rezervasyon için müsait aletler
@@ -129,8 +160,8 @@ BEGIN
 END;
 $$;
 
--- FONKSİYON 2: RECORD ve CURSOR (İMLEÇ) kullanarak kullanıcı aktivite raporunu getir
--- Bu fonksiyon kullanıcının rezervasyonları üzerinde döner ve bir rapor oluşturur
+-- FONKSİYON 2: RETURN QUERY ile kullanıcı aktivite raporunu getir
+-- Ödünç alınan ve verilen rezervasyonlar tek sorguda birleştirilerek döndürülür
 CREATE OR REPLACE FUNCTION get_user_activity_report(p_user_id INTEGER)
 RETURNS TABLE(
     activity_type VARCHAR,
@@ -141,11 +172,11 @@ RETURNS TABLE(
 )
 LANGUAGE plpgsql
 AS $$
-DECLARE
-    v_record RECORD;
-    v_cursor CURSOR FOR
+BEGIN
+    -- Tek plan: satırlar imleç döngüsü olmadan doğrudan döndürülür
+    RETURN QUERY
         SELECT 
-            'borrowed' AS type,
+            'borrowed'::VARCHAR AS type,
             t.name AS tool_name,
             owner.username AS partner,
             r.start_date AS activity_date,
@@ -156,7 +187,7 @@ DECLARE
         WHERE r.borrower_id = p_user_id
         UNION ALL
         SELECT 
-            'lent' AS type,
+            'lent'::VARCHAR AS type,
             t.name AS tool_name,
             borrower.username AS partner,
             r.start_date AS activity_date,
@@ -165,22 +196,7 @@ DECLARE
         JOIN tools t ON r.tool_id = t.tool_id
         JOIN users borrower ON r.borrower_id = borrower.user_id
         WHERE t.owner_id = p_user_id
-        ORDER BY activity_date DESC;
-BEGIN
-    OPEN v_cursor;
-    LOOP
-        FETCH v_cursor INTO v_record;
-        EXIT WHEN NOT FOUND;
-        
-        activity_type := v_record.type;
-        tool_name := v_record.tool_name;
-        partner_name := v_record.partner;
-        activity_date := v_record.activity_date;
-        status := v_record.status;
-        
-        RETURN NEXT;
-    END LOOP;
-    CLOSE v_cursor;
+        ORDER BY 4 DESC;
 END;
 $$;
 
@@ -194,21 +210,184 @@ RETURNS BOOLEAN
 LANGUAGE plpgsql
 AS $$
 DECLARE
-    v_conflict_count INTEGER;
+    v_has_conflict BOOLEAN;
 BEGIN
-    SELECT COUNT(*)
-    INTO v_conflict_count
-    FROM reservations
-    WHERE tool_id = p_tool_id
-      AND status IN ('pending', 'approved')
-      AND (
-          (start_date < p_end_date AND end_date > p_start_date)
-      );
+    SELECT EXISTS (
+        SELECT 1
+        FROM reservations
+        WHERE tool_id = p_tool_id
+          AND status IN ('pending', 'approved')
+          AND start_date < p_end_date
+          AND end_date > p_start_date
+    )
+    INTO v_has_conflict;
     
-    RETURN v_conflict_count = 0;
+    RETURN NOT v_has_conflict;
 END;
 $$;
 
+-- FONKSİYON 4: Kullanıcı panelindeki tüm listeleri tek bir JSONB belgesi olarak döndür
+-- Panel 12 ayrı sorgu yerine tek bir gidiş-dönüşte yüklenir
+CREATE OR REPLACE FUNCTION get_dashboard(
+    p_user_id INTEGER,
+    p_is_admin BOOLEAN,
+    p_admin_offset INTEGER DEFAULT 0,
+    p_admin_limit INTEGER DEFAULT 50,
+    p_list_limit INTEGER DEFAULT 50
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    -- Kullanıcının kiracı veya alet sahibi olduğu rezervasyonlar bir kez okunur;
+    -- kendi rezervasyonları, aletlerine gelen rezervasyonlar, aktivite raporu ve
+    -- puanlanabilir rezervasyonlar bu ortak CTE'den türetilir
+    WITH user_reservations AS MATERIALIZED (
+        SELECT 'borrowed' AS activity_type,
+               r.reservation_id, r.borrower_id, t.owner_id,
+               r.start_date, r.end_date, r.status,
+               t.name AS tool_name,
+               owner.username AS owner_name,
+               borrower.username AS borrower_name
+        FROM reservations r
+        JOIN tools t ON r.tool_id = t.tool_id
+        JOIN users owner ON t.owner_id = owner.user_id
+        JOIN users borrower ON r.borrower_id = borrower.user_id
+        WHERE r.borrower_id = p_user_id
+        UNION ALL
+        SELECT 'lent' AS activity_type,
+               r.reservation_id, r.borrower_id, t.owner_id,
+               r.start_date, r.end_date, r.status,
+               t.name AS tool_name,
+               owner.username AS owner_name,
+               borrower.username AS borrower_name
+        FROM reservations r
+        JOIN tools t ON r.tool_id = t.tool_id
+        JOIN users owner ON t.owner_id = owner.user_id
+        JOIN users borrower ON r.borrower_id = borrower.user_id
+        WHERE t.owner_id = p_user_id
+    )
+    SELECT jsonb_build_object(
+        'my_tools', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'tool_id', t.tool_id,
+                'name', t.name,
+                'category', t.category,
+                'status', t.status
+            ) ORDER BY t.tool_id)
+            FROM tools t
+            WHERE t.owner_id = p_user_id
+        ), '[]'::jsonb),
+        -- Geçmiş listeleri en yeni p_list_limit kayıtla sınırlandırılır
+        'my_reservations', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'reservation_id', ur.reservation_id,
+                'tool_name', ur.tool_name,
+                'owner_name', ur.owner_name,
+                'start_date', ur.start_date::text,
+                'end_date', ur.end_date::text,
+                'status', ur.status
+            ) ORDER BY ur.start_date DESC)
+            FROM (
+                SELECT * FROM user_reservations
+                WHERE borrower_id = p_user_id
+                ORDER BY start_date DESC
+                LIMIT p_list_limit
+            ) ur
+        ), '[]'::jsonb),
+        'tool_reservations', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'reservation_id', ur.reservation_id,
+                'tool_name', ur.tool_name,
+                'borrower_name', ur.borrower_name,
+                'start_date', ur.start_date::text,
+                'end_date', ur.end_date::text,
+                'status', ur.status
+            ) ORDER BY ur.start_date DESC)
+            FROM (
+                SELECT * FROM user_reservations
+                WHERE owner_id = p_user_id
+                ORDER BY start_date DESC
+                LIMIT p_list_limit
+            ) ur
+        ), '[]'::jsonb),
+        'my_ratings', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'rater_name', r.rater_name,
+                'score', r.score,
+                'comment', r.comment,
+                'created_at', r.created_at::text
+            ) ORDER BY r.created_at DESC)
+            FROM (
+                SELECT u.username AS rater_name, r.score, r.comment, r.created_at
+                FROM ratings r
+                JOIN users u ON r.rater_id = u.user_id
+                WHERE r.rated_user_id = p_user_id
+                ORDER BY r.created_at DESC
+                LIMIT p_list_limit
+            ) r
+        ), '[]'::jsonb),
+        'activity_report', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'activity_type', a.activity_type,
+                'tool_name', a.tool_name,
+                'partner_name', a.partner_name,
+                'activity_date', a.activity_date::text,
+                'status', a.status
+            ) ORDER BY a.activity_date DESC)
+            FROM (
+                -- get_user_activity_report ile aynı satırlar; ayrıca fonksiyon
+                -- çağrılıp rezervasyonlar yeniden taranmaz
+                SELECT activity_type, tool_name,
+                       CASE WHEN activity_type = 'borrowed' THEN owner_name ELSE borrower_name END AS partner_name,
+                       start_date AS activity_date,
+                       status
+                FROM user_reservations
+                ORDER BY start_date DESC
+                LIMIT p_list_limit
+            ) a
+        ), '[]'::jsonb),
+        'ratable_reservations', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'reservation_id', ur.reservation_id,
+                'tool_name', ur.tool_name,
+                'other_user_id', CASE WHEN ur.borrower_id = p_user_id THEN ur.owner_id ELSE ur.borrower_id END,
+                'other_user_name', CASE WHEN ur.borrower_id = p_user_id THEN ur.owner_name ELSE ur.borrower_name END
+            ))
+            FROM user_reservations ur
+            LEFT JOIN ratings rt
+                   ON rt.reservation_id = ur.reservation_id
+                  AND rt.rater_id = p_user_id
+            WHERE ur.status = 'completed'
+              AND rt.rating_id IS NULL
+        ), '[]'::jsonb),
+        -- Yönetici listeleri yalnızca p_is_admin ise, sayfa sayfa doldurulur
+        'all_users', CASE WHEN p_is_admin THEN COALESCE((
+            SELECT jsonb_agg(u ORDER BY u.user_id)
+            FROM (
+                SELECT user_id, username, role, trust_score
+                FROM users
+                ORDER BY user_id
+                LIMIT p_admin_limit OFFSET p_admin_offset
+            ) u
+        ), '[]'::jsonb) ELSE '[]'::jsonb END,
+        'all_tools', CASE WHEN p_is_admin THEN COALESCE((
+            SELECT jsonb_agg(a ORDER BY a.tool_id)
+            FROM (
+                SELECT t.tool_id, t.name, u.username AS owner_name, t.status
+                FROM tools t
+                JOIN users u ON t.owner_id = u.user_id
+                ORDER BY t.tool_id
+                LIMIT p_admin_limit OFFSET p_admin_offset
+            ) a
+        ), '[]'::jsonb) ELSE '[]'::jsonb END,
+        'admin_has_next', p_is_admin AND (
+            EXISTS (SELECT 1 FROM users ORDER BY user_id OFFSET p_admin_offset + p_admin_limit)
+            OR EXISTS (SELECT 1 FROM tools ORDER BY tool_id OFFSET p_admin_offset + p_admin_limit)
+        )
+    );
+$$;
+
 -- TETİKLEYİCİ FONKSİYONU: Zaman damgasını otomatik güncelle
 CREATE OR REPLACE FUNCTION fn_update_timestamp()
 RETURNS TRIGGER
@@ -221,13 +400,13 @@ END;
 $$;
 
 
--- TETİKLEYİCİ FONKSİYONU: Çifte rezervasyonu engelle
-CREATE OR REPLACE FUNCTION fn_prevent_double_booking()
+-- TETİKLEYİCİ FONKSİYONU: Kullanıcının kendi aletini rezerve etmesini engelle
+-- (Çakışan rezervasyonlar no_overlap dışlama kısıtlaması ile engellenir)
+CREATE OR REPLACE FUNCTION fn_prevent_self_booking()
 RETURNS TRIGGER
 LANGUAGE plpgsql
 AS $$
 DECLARE
-    v_conflict_count INTEGER;
     v_tool_owner_id INTEGER;
 BEGIN
     -- Kullanıcının kendi aletini rezerve etmeye çalışıp çalışmadığını kontrol et
@@ -239,34 +418,31 @@ BEGIN
         RAISE EXCEPTION 'You cannot reserve your own tool.';
     END IF;
     
-    -- Çakışan rezervasyonları kontrol et
-    SELECT COUNT(*)
-    INTO v_conflict_count
-    FROM reservations
-    WHERE tool_id = NEW.tool_id
-      AND reservation_id != COALESCE(NEW.reservation_id, 0)
-      AND status IN ('pending', 'approved')
-       AND (start_date < NEW.end_date AND end_date > NEW.start_date);
-    
-    IF v_conflict_count > 0 THEN
-        RAISE EXCEPTION 'This tool is already reserved for the selected dates.';
-    END IF;
-    
     RETURN NEW;
 END;
 $$;
 
--- TETİKLEYİCİ FONKSİYONU: Puanlamadan sonra kullanıcı güven skorunu güncelle
+-- TETİKLEYİCİ FONKSİYONU: Puan eklenince/silinince kullanıcı güven skorunu ve puan sayısını güncelle
 CREATE OR REPLACE FUNCTION fn_update_trust_score()
 RETURNS TRIGGER
 LANGUAGE plpgsql
 AS $$
+DECLARE
+    v_user_id INTEGER;
 BEGIN
+    -- Puan silindiğinde (ör. alet/kullanıcı silinince CASCADE) de yeniden hesaplanır
+    IF TG_OP = 'DELETE' THEN
+        v_user_id := OLD.rated_user_id;
+    ELSE
+        v_user_id := NEW.rated_user_id;
+    END IF;
+
     UPDATE users
-    SET trust_score = calculate_trust_score(NEW.rated_user_id)
-    WHERE user_id = NEW.rated_user_id;
+    SET trust_score = calculate_trust_score(v_user_id),
+        rating_count = (SELECT COUNT(*) FROM ratings WHERE rated_user_id = v_user_id)
+    WHERE user_id = v_user_id;
     
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$;
 
@@ -276,32 +452,33 @@ CREATE TRIGGER trg_update_timestamp
     FOR EACH ROW
     EXECUTE FUNCTION fn_update_timestamp();
 
--- TETİKLEYİCİ 2: Rezervasyonlarda çifte rezervasyonu engelle
-CREATE TRIGGER trg_prevent_double_booking
-    BEFORE INSERT OR UPDATE ON reservations
+-- TETİKLEYİCİ 2: Rezervasyonlarda kendi aletini rezerve etmeyi engelle
+-- (Yalnızca alet veya kiracı değiştiğinde çalışır; durum güncellemeleri tetiklemez)
+CREATE TRIGGER trg_prevent_self_booking
+    BEFORE INSERT OR UPDATE OF tool_id, borrower_id ON reservations
     FOR EACH ROW
-    EXECUTE FUNCTION fn_prevent_double_booking();
+    EXECUTE FUNCTION fn_prevent_self_booking();
 
 
--- TETİKLEYİCİ 3: Puanlamadan sonra güven skorunu otomatik güncelle
+-- TETİKLEYİCİ 3: Puan eklenince veya silinince güven skorunu otomatik güncelle
 CREATE TRIGGER trg_update_user_trust_score
-    AFTER INSERT ON ratings
+    AFTER INSERT OR DELETE ON ratings
     FOR EACH ROW
     EXECUTE FUNCTION fn_update_trust_score();
 
 
 -- ÖRNEK VERİLER
 INSERT INTO users (username, email, password_hash, role, trust_score) VALUES
-('admin', 'admin@toolshare.com', 'pbkdf2:sha256:260000$admin123', 'admin', 5.00),
-('ahmet_yilmaz', 'ahmet@email.com', 'pbkdf2:sha256:260000$user123', 'user', 4.50),
-('mehmet_demir', 'mehmet@email.com', 'pbkdf2:sha256:260000$user123', 'user', 4.20),
-('ayse_kaya', 'ayse@email.com', 'pbkdf2:sha256:260000$user123', 'user', 4.80),
-('fatma_celik', 'fatma@email.com', 'pbkdf2:sha256:260000$user123', 'user', 3.90),
-('ali_ozturk', 'ali@email.com', 'pbkdf2:sha256:260000$user123', 'user', 4.10),
-('zeynep_arslan', 'zeynep@email.com', 'pbkdf2:sha256:260000$user123', 'user', 4.60),
-('mustafa_sahin', 'mustafa@email.com', 'pbkdf2:sha256:260000$user123', 'user', 3.70),
-('elif_yildiz', 'elif@email.com', 'pbkdf2:sha256:260000$user123', 'user', 4.40),
-('emre_aksoy', 'emre@email.com', 'pbkdf2:sha256:260000$user123', 'user', 4.00);
+('admin', 'admin@toolshare.com', '$2b$12$SCNTOyC.I68VwYgxWTPBOeDHJEI6vRCM.UN3KFAoGdzCjOORWK8UC', 'admin', 5.00),
+('ahmet_yilmaz', 'ahmet@email.com', '$2b$12$7K7du.uMfks81fvtTs8hGOnYN9/7153nN2yV8tTe.tMMIZx8C52gK', 'user', 4.50),
+('mehmet_demir', 'mehmet@email.com', '$2b$12$7K7du.uMfks81fvtTs8hGOnYN9/7153nN2yV8tTe.tMMIZx8C52gK', 'user', 4.20),
+('ayse_kaya', 'ayse@email.com', '$2b$12$7K7du.uMfks81fvtTs8hGOnYN9/7153nN2yV8tTe.tMMIZx8C52gK', 'user', 4.80),
+('fatma_celik', 'fatma@email.com', '$2b$12$7K7du.uMfks81fvtTs8hGOnYN9/7153nN2yV8tTe.tMMIZx8C52gK', 'user', 3.90),
+('ali_ozturk', 'ali@email.com', '$2b$12$7K7du.uMfks81fvtTs8hGOnYN9/7153nN2yV8tTe.tMMIZx8C52gK', 'user', 4.10),
+('zeynep_arslan', 'zeynep@email.com', '$2b$12$7K7du.uMfks81fvtTs8hGOnYN9/7153nN2yV8tTe.tMMIZx8C52gK', 'user', 4.60),
+('mustafa_sahin', 'mustafa@email.com', '$2b$12$7K7du.uMfks81fvtTs8hGOnYN9/7153nN2yV8tTe.tMMIZx8C52gK', 'user', 3.70),
+('elif_yildiz', 'elif@email.com', '$2b$12$7K7du.uMfks81fvtTs8hGOnYN9/7153nN2yV8tTe.tMMIZx8C52gK', 'user', 4.40),
+('emre_aksoy', 'emre@email.com', '$2b$12$7K7du.uMfks81fvtTs8hGOnYN9/7153nN2yV8tTe.tMMIZx8C52gK', 'user', 4.00);
 
 
 INSERT INTO tools (owner_id, name, description, category, status) VALUES
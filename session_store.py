@@ -0,0 +1,74 @@
+# ToolShare uygulaması için Redis tabanlı oturum deposu
+#
+# Oturumlar tüm uvicorn worker'larının paylaştığı Redis'te "sess:<id>"
+# anahtarında alan başına bir değer tutan hash olarak, SESSION_TTL saniyelik
+# süreyle saklanır; okuma tek HGETALL ile yapılır.
+#
+# REDIS_URL: Redis bağlantı adresi. Verilmezse REDIS_HOST (varsayılan
+# localhost) üzerindeki 6379 portu kullanılır.
+
+from dataclasses import asdict, dataclass
+from secrets import token_urlsafe
+from typing import Optional
+import os
+
+from redis import asyncio as aioredis
+
+REDIS_URL = os.getenv(
+    "REDIS_URL",
+    f"redis://{os.getenv('REDIS_HOST', 'localhost')}:6379/0"
+)
+SESSION_TTL = 86400
+
+redis_client = aioredis.from_url(REDIS_URL, decode_responses=False)
+
+
+@dataclass(slots=True)
+class SessionUser:
+    """Oturumda saklanan giriş yapmış kullanıcı bilgisi."""
+    user_id: int
+    username: str
+    role: str
+    trust_score: float
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+
+def _session_key(session_id: str) -> str:
+    return f"sess:{session_id}"
+
+
+async def create_session(user: SessionUser) -> str:
+    """
+    Kullanıcı için yeni bir oturum açar.
+
+    Returns:
+        str: Çereze yazılacak oturum kimliği.
+    """
+    session_id = token_urlsafe(32)
+    key = _session_key(session_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=asdict(user))
+        pipe.expire(key, SESSION_TTL)
+        await pipe.execute()
+    return session_id
+
+
+async def get_session(session_id: str) -> Optional[SessionUser]:
+    """Oturum kimliğine ait kullanıcıyı getirir; oturum yoksa None döner."""
+    data = await redis_client.hgetall(_session_key(session_id))
+    if not data:
+        return None
+    return SessionUser(
+        user_id=int(data[b"user_id"]),
+        username=data[b"username"].decode(),
+        role=data[b"role"].decode(),
+        trust_score=float(data[b"trust_score"])
+    )
+
+
+async def delete_session(session_id: str) -> None:
+    """Oturumu siler."""
+    await redis_client.delete(_session_key(session_id))